@@ -0,0 +1,498 @@
+"""
+Static analysis of SIGIL pattern regexes.
+
+Helpers here inspect a pattern's parse tree (via the stdlib ``re`` parser)
+so the scanner can skip regexes that provably cannot match a payload.
+Everything is conservative: when a pattern is too complex to reason about,
+the helpers return ``None`` and the scanner simply runs the regex.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Optional
+
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover - Python < 3.11
+    import sre_parse as _sre_parse  # type: ignore[no-redef]
+
+_LITERAL    = _sre_parse.LITERAL
+_IN         = _sre_parse.IN
+_BRANCH     = _sre_parse.BRANCH
+_SUBPATTERN = _sre_parse.SUBPATTERN
+_RANGE      = _sre_parse.RANGE
+_REPEATS    = (_sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT)
+_AT         = _sre_parse.AT
+_ASSERT     = _sre_parse.ASSERT
+_ASSERT_NOT = _sre_parse.ASSERT_NOT
+_CATEGORY   = _sre_parse.CATEGORY
+_GROUPREF_EXISTS = _sre_parse.GROUPREF_EXISTS
+
+# Word boundaries see a NUL separator exactly as they see the text's edge.
+_BOUNDARIES = frozenset({_sre_parse.AT_BOUNDARY, _sre_parse.AT_NON_BOUNDARY})
+
+# Constructs that may behave differently once the text is embedded in a
+# larger buffer (Python 3.11+ only; absent names are simply skipped).
+_GREEDY_COMMIT = frozenset(
+    getattr(_sre_parse, name) for name in ("ATOMIC_GROUP", "POSSESSIVE_REPEAT")
+    if hasattr(_sre_parse, name)
+)
+
+# Shorthand classes that never match NUL.
+_NUL_FREE_CATEGORIES = frozenset({
+    _sre_parse.CATEGORY_DIGIT, _sre_parse.CATEGORY_SPACE, _sre_parse.CATEGORY_WORD,
+})
+
+# Upper bound on alternative anchors per pattern (e.g. ``gh[ps]_`` → 2).
+_MAX_ALTERNATIVES = 16
+
+# Leading global inline flags, e.g. the ``(?i)`` in ``(?i)DROP\s+TABLE``.
+_GLOBAL_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+
+# Back-references change meaning once a regex is embedded in a larger one.
+_GROUP_REFERENCE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+_SCOPED_FLAGS = (
+    (re.IGNORECASE, "i"),
+    (re.MULTILINE, "m"),
+    (re.DOTALL, "s"),
+    (re.VERBOSE, "x"),
+    (re.ASCII, "a"),
+)
+
+# Scoped inline flags, e.g. ``(?i:...)`` or ``(?-i:...)``.
+_SCOPED_GROUP = re.compile(r"\(\?(?:[aiLmsux]+(?:-[imsx]+)?|-[imsx]+):")
+
+# Python's Unicode-aware ``\d``, ``\w`` and ``\s`` spelled out for the native
+# engines (RE2, Hyperscan), whose shorthand classes differ. ``\s`` is exact;
+# ``\d`` and ``\w`` follow each engine's own Unicode tables, so letters and
+# digits added or recategorised since Unicode 3.2 may match differently
+# than under the running Python (e.g. Hyperscan's ``\p{L}`` lacks U+0860).
+_NATIVE_CLASSES = {
+    "d": r"\p{Nd}",
+    "w": r"\p{L}\p{N}_",
+    "s": r"\t\n\x{0B}\f\r\x{1C}-\x{1F}\x{85}\p{Z}",
+}
+
+# The rest of a ``{,n}`` quantifier after its "{". Python reads the missing
+# lower bound as 0.
+_OPEN_LOWER_BOUND = re.compile(r",\d*\}")
+
+# Group openers that carry no flags and can be copied verbatim.
+_PLAIN_GROUP = re.compile(r"\(\?(?::|=|!|>|<=|<!|P<\w+>|P=\w+\)|#[^)]*\))")
+
+# Escapes whose meaning does not depend on case-insensitive matching.
+_CASE_NEUTRAL_ESCAPES = frozenset("dwsDWSbBAZntrfv\\.^$|?*+()[]{}-/ #&~'\"!%,:;<=>@_`")
+
+# Non-ASCII characters that CPython's ``re.IGNORECASE`` treats as equal to
+# an ASCII letter. ``str.lower()`` alone would not map them, so a payload
+# like "ıgnore previous ınstructions" could slip past the prefilter.
+_CASELESS_FOLD = str.maketrans({"İ": "i", "ı": "i", "ſ": "s", "K": "k"})
+
+
+def fold_caseless(text: str) -> str:
+    """Lower-case ``text`` so that it contains every caseless anchor the
+    regex engine would match under ``re.IGNORECASE``."""
+    if text.isascii():
+        return text.lower()
+    return text.translate(_CASELESS_FOLD).lower()
+
+
+def scoped(pattern: re.Pattern) -> Optional[str]:
+    """
+    Rewrite a compiled pattern as a self-contained ``(?flags:...)`` group that
+    can be joined with others into one alternation. Returns ``None`` for
+    patterns that would not keep their meaning (named groups, back-references).
+    """
+    if pattern.groupindex or _GROUP_REFERENCE.search(pattern.pattern):
+        return None
+    body = _GLOBAL_FLAGS.sub("", pattern.pattern, count=1)
+    if pattern.flags & re.VERBOSE:
+        body += "\n"  # end a trailing ``# comment`` before the closing paren
+    flags = "".join(c for flag, c in _SCOPED_FLAGS if pattern.flags & flag)
+    return f"(?{flags}:{body})" if flags else f"(?:{body})"
+
+
+def native_syntax(pattern: re.Pattern) -> Optional[str]:
+    """
+    Translate a compiled Python pattern into the syntax shared by RE2 and
+    Hyperscan, with the same matching semantics up to the engines' Unicode
+    versions (see ``_NATIVE_CLASSES``). Returns ``None`` for constructs
+    whose meaning differs between the engines (word boundaries, scoped
+    flags, ASCII/verbose mode); those patterns stay on ``re``.
+    Anything a native engine does not support at all (look-arounds,
+    back-references) surfaces later as a compile error.
+    """
+    src = pattern.pattern
+    if pattern.flags & (re.ASCII | re.LOCALE | re.VERBOSE) or _SCOPED_GROUP.search(src):
+        return None
+    multiline = pattern.flags & re.MULTILINE
+
+    out: list[str] = []
+    in_class = False
+    i, n = 0, len(src)
+    while i < n:
+        c = src[i]
+        if c == "\\":
+            if i + 1 >= n:
+                return None
+            e = src[i + 1]
+            i += 2
+            if e in "dws":
+                cls = _NATIVE_CLASSES[e]
+                out.append(cls if in_class else f"[{cls}]")
+            elif e in "DWS":
+                if in_class:
+                    return None
+                out.append(f"[^{_NATIVE_CLASSES[e.lower()]}]")
+            elif e in "bB":
+                return None
+            elif e == "Z":
+                out.append(r"\z")
+            elif e == "v":
+                out.append(r"\x0b")  # Hyperscan reads \v as any vertical space
+            else:
+                out.append(c + e)
+            continue
+
+        i += 1
+        if c == "[" and src.startswith(":", i):
+            return None  # "[:" opens a POSIX class in the native engines
+        if in_class:
+            in_class = c != "]"
+            out.append(c)
+        elif c == "{" and _OPEN_LOWER_BOUND.match(src, i):
+            out.append("{0")  # the native engines read "{,n}" as a literal
+        elif c == "[":
+            in_class = True
+            out.append(c)
+            if src.startswith("^", i):
+                out.append("^")
+                i += 1
+            if src.startswith("]", i):  # a leading "]" is a literal in Python
+                out.append("\\]")
+                i += 1
+        elif c == "$" and not multiline:
+            out.append(r"(?:\n?\z)")  # Python's "$" also matches before a final newline
+        else:
+            out.append(c)
+    return "".join(out)
+
+
+def _class_atom(src: str, i: int) -> tuple[Optional[str], Optional[str], int]:
+    """Read one character-class atom at ``src[i]``: ``(source, literal, end)``.
+    ``literal`` is the single character it stands for, or ``None`` for
+    shorthand classes like ``\\w``; ``source`` is ``None`` if unsupported."""
+    if src[i] != "\\":
+        return src[i], src[i], i + 1
+    e = src[i + 1:i + 2]
+    if not e or e not in _CASE_NEUTRAL_ESCAPES or e in "AZB":
+        return None, None, i + 2
+    literal = None if e.isalpha() else e
+    return src[i:i + 2], literal, i + 2
+
+
+def _folded_class(src: str, i: int) -> tuple[Optional[str], int]:
+    """Rewrite the character class opening at ``src[i]`` for folded text:
+    every upper-case ASCII item gets its lower-case counterpart added."""
+    out = ["["]
+    extra: list[str] = []
+    i += 1
+    if src.startswith("^", i):
+        out.append("^")
+        i += 1
+    first = True
+    while i < len(src) and (first or src[i] != "]"):
+        first = False
+        atom, lo, i = _class_atom(src, i)
+        if atom is None:
+            return None, i
+        if lo is not None and src.startswith("-", i) and i + 1 < len(src) and src[i + 1] != "]":
+            hi_atom, hi, i = _class_atom(src, i + 1)
+            if hi_atom is None or hi is None:
+                return None, i
+            out.append(f"{atom}-{hi_atom}")
+            a, b = max(ord(lo), ord("A")), min(ord(hi), ord("Z"))
+            if a <= b:
+                extra.append(f"{chr(a + 32)}-{chr(b + 32)}")
+            continue
+        out.append(atom)
+        if lo is not None and "A" <= lo <= "Z":
+            extra.append(lo.lower())
+    if i >= len(src):
+        return None, i
+    out.extend(extra)
+    out.append("]")
+    return "".join(out), i + 1
+
+
+def folded_syntax(pattern: re.Pattern) -> Optional[str]:
+    """
+    Rewrite a case-insensitive pattern as a case-sensitive one that matches
+    :func:`fold_caseless` text exactly where the original matches the raw
+    text. ``re.IGNORECASE`` turns off ``_sre``'s literal-prefix fast search
+    and folds every character it compares; the rewritten pattern, run over
+    a payload the prefilter has already folded, avoids both.
+
+    Returns ``None`` for patterns it cannot rewrite faithfully (non-ASCII
+    literals, ASCII mode, scoped or mid-pattern flags, numeric escapes).
+    """
+    if not pattern.flags & re.IGNORECASE:
+        return None
+    if pattern.flags & re.ASCII:
+        return None  # "ı" is no "i" there, but fold_caseless makes it one
+    src = pattern.pattern
+    if not src.isascii():
+        return None
+
+    out: list[str] = []
+    head = _GLOBAL_FLAGS.match(src)
+    i = 0
+    if head:
+        rest = head.group(1).replace("i", "")
+        out.append(f"(?{rest})" if rest else "")
+        i = head.end()
+
+    n = len(src)
+    while i < n:
+        c = src[i]
+        if c == "\\":
+            e = src[i + 1:i + 2]
+            if not e or not (e in _CASE_NEUTRAL_ESCAPES or e in "123456789"):
+                return None
+            out.append(c + e)
+            i += 2
+        elif c == "[":
+            cls, i = _folded_class(src, i)
+            if cls is None:
+                return None
+            out.append(cls)
+        elif c == "(" and src.startswith("?", i + 1):
+            group = _PLAIN_GROUP.match(src, i)
+            if group is None:  # flags, conditionals: leave the pattern alone
+                return None
+            out.append(group.group())
+            i = group.end()
+        else:
+            out.append(c.lower())
+            i += 1
+    return "".join(out)
+
+
+def _alternatives(items, prefixes: list[str]) -> tuple[list[str], bool]:
+    """Extend ``prefixes`` with the literal run at the start of ``items``.
+
+    Returns the extended prefixes and whether all of ``items`` was consumed
+    (i.e. whether a caller may keep appending what follows).
+    """
+    for op, av in items:
+        if op is _LITERAL:
+            prefixes = [p + chr(av) for p in prefixes]
+            continue
+
+        if op is _IN and av and all(o is _LITERAL for o, _ in av):
+            chars = [chr(v) for _, v in av]
+        elif op is _BRANCH:
+            chars = []
+            complete = True
+            for branch in av[1]:
+                alts, done = _alternatives(branch, [""])
+                chars.extend(alts)
+                complete = complete and done
+            if len(prefixes) * len(chars) > _MAX_ALTERNATIVES:
+                return prefixes, False
+            prefixes = [p + c for p in prefixes for c in chars]
+            if not complete:
+                return prefixes, False
+            continue
+        elif op is _SUBPATTERN and not av[1] and not av[2]:
+            prefixes, done = _alternatives(av[3], prefixes)
+            if not done:
+                return prefixes, False
+            continue
+        else:
+            return prefixes, False
+
+        if len(prefixes) * len(chars) > _MAX_ALTERNATIVES:
+            return prefixes, False
+        prefixes = [p + c for p in prefixes for c in chars]
+
+    return prefixes, True
+
+
+def literal_anchors(regex: str) -> Optional[tuple[list[str], bool]]:
+    """
+    Return ``(anchors, caseless)`` for ``regex``: every match must start
+    with one of ``anchors``. Caseless anchors are already folded with
+    :func:`fold_caseless` and must be looked up in folded text.
+
+    Returns ``None`` when no literal prefix can be extracted.
+    """
+    try:
+        parsed = _sre_parse.parse(regex)
+    except (re.error, RecursionError):
+        return None
+
+    anchors, _ = _alternatives(list(parsed), [""])
+    if not anchors or not all(anchors):
+        return None
+
+    caseless = bool(parsed.state.flags & re.IGNORECASE)
+    if caseless:
+        if not all(a.isascii() for a in anchors):
+            return None
+        anchors = [a.lower() for a in anchors]
+    return sorted(set(anchors)), caseless
+
+
+def _ascii_class(items) -> Optional[str]:
+    """The members of a parsed ``[...]`` class as a sorted string, if it is
+    a plain set of ASCII characters and ranges."""
+    members: set[str] = set()
+    for op, av in items:
+        if op is _LITERAL and av < 128:
+            members.add(chr(av))
+        elif op is _RANGE and av[1] < 128:
+            members.update(map(chr, range(av[0], av[1] + 1)))
+        else:  # negation, shorthand categories, non-ASCII
+            return None
+    return "".join(sorted(members))
+
+
+def class_run(regex: str) -> Optional[tuple[list[str], str, int]]:
+    """
+    Recognise key-shaped patterns such as ``AKIA[0-9A-Z]{16}`` or
+    ``sk-[a-zA-Z0-9]{32,}``: literal anchors followed by a run of at least
+    ``n`` characters from an ASCII class, and nothing else. Returns
+    ``(anchors, members, n)``; the pattern matches exactly where an anchor
+    is followed by ``n`` characters from ``members``, so no regex needs
+    to run.
+    """
+    try:
+        parsed = _sre_parse.parse(regex)
+    except (re.error, RecursionError):
+        return None
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+
+    items = list(parsed)
+    if len(items) < 2 or items[-1][0] not in _REPEATS:
+        return None
+    low, _, body = items[-1][1]
+    body = list(body)
+    if low < 1 or len(body) != 1 or body[0][0] is not _IN:
+        return None
+    members = _ascii_class(body[0][1])
+    if not members:
+        return None
+
+    anchors, complete = _alternatives(items[:-1], [""])
+    if not complete or not anchors or not all(anchors):
+        return None
+    return sorted(set(anchors)), members, low
+
+
+def _branches(items) -> int:
+    """Number of alternatives across every ``|`` in a parsed pattern."""
+    count = 0
+    for op, av in items:
+        if op is _BRANCH:
+            count += len(av[1]) + sum(_branches(branch) for branch in av[1])
+        elif op is _SUBPATTERN:
+            count += _branches(av[3])
+        elif op in _REPEATS:
+            count += _branches(av[2])
+        elif op in (_ASSERT, _ASSERT_NOT):
+            count += _branches(av[1])
+    return count
+
+
+def match_cost(pattern: re.Pattern) -> tuple[bool, int, bool, int]:
+    """
+    Sort key estimating how expensive ``pattern`` is to search for: patterns
+    with a literal prefix (fast search) first, then fewer alternatives,
+    case-sensitive before ``re.IGNORECASE``, then shorter source.
+    """
+    try:
+        alternatives = _branches(list(_sre_parse.parse(pattern.pattern, pattern.flags)))
+    except (re.error, RecursionError):
+        alternatives = 0
+    return (
+        literal_anchors(pattern.pattern) is None,
+        alternatives,
+        bool(pattern.flags & re.IGNORECASE),
+        len(pattern.pattern),
+    )
+
+
+def _nul_free(items) -> bool:
+    """Whether nothing in ``items`` can consume a NUL character."""
+    for op, av in items:
+        if op is _LITERAL:
+            if av == 0:
+                return False
+        elif op is _IN:
+            for item_op, item in av:
+                if item_op is _LITERAL and item != 0:
+                    continue
+                if item_op is _RANGE and item[0] > 0:
+                    continue
+                if item_op is _CATEGORY and item in _NUL_FREE_CATEGORIES:
+                    continue
+                return False
+        elif op is _SUBPATTERN:
+            if not _nul_free(av[3]):
+                return False
+        elif op in _REPEATS:
+            if not _nul_free(av[2]):
+                return False
+        elif op is _BRANCH:
+            if not all(_nul_free(branch) for branch in av[1]):
+                return False
+        elif not (op is _AT and av in _BOUNDARIES):
+            return False
+    return True
+
+
+def _context_free(items) -> bool:
+    for op, av in items:
+        if op is _AT:
+            if av not in _BOUNDARIES:
+                return False
+        elif op in _GREEDY_COMMIT:
+            return False
+        elif op is _ASSERT_NOT:
+            # At the text's edge a negative look-around now sees a NUL.
+            if not _nul_free(av[1]):
+                return False
+        elif op is _ASSERT:
+            if not _context_free(av[1]):
+                return False
+        elif op is _SUBPATTERN:
+            if not _context_free(av[3]):
+                return False
+        elif op in _REPEATS:
+            if not _context_free(av[2]):
+                return False
+        elif op is _BRANCH:
+            if not all(_context_free(branch) for branch in av[1]):
+                return False
+        elif op is _GROUPREF_EXISTS:
+            if not all(_context_free(branch) for branch in av[1:] if branch is not None):
+                return False
+    return True
+
+
+def context_free(regex: str) -> bool:
+    """
+    Whether every match of ``regex`` in a text is still found once the text
+    is embedded between NUL separators in a larger buffer. Fails for
+    anchors (``^``, ``$``, ``\\A``, ``\\Z``), negative look-arounds that could
+    consume a NUL, and atomic groups; errs on the side of ``False``.
+    """
+    try:
+        parsed = _sre_parse.parse(regex)
+    except (re.error, RecursionError):
+        return False
+    return _context_free(list(parsed))
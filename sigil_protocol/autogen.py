@@ -23,7 +23,6 @@ Usage:
 
 from __future__ import annotations
 
-import json
 import logging
 from functools import wraps
 from typing import Any, Callable
@@ -48,8 +47,7 @@ def sigil_function(fn: Callable) -> Callable:
     """
     @wraps(fn)
     def wrapper(*args: Any, **kwargs: Any) -> Any:
-        payload = json.dumps({"args": list(args), "kwargs": kwargs})
-        result = scanner().scan(payload)
+        result = scanner().scan_call(args, kwargs, exhaustive=False)
         if result.blocked:
             raise RuntimeError(
                 f"🔐 SIGIL blocked call to `{fn.__name__}`: "
@@ -90,8 +88,7 @@ class SigilProxy:
         Call gate. Returns None to allow the call, or a dict with
         {"content": "SIGIL BLOCKED: ..."} to short-circuit with an error.
         """
-        payload = json.dumps({"function": func_name, "args": func_args})
-        result = scanner().scan(payload)
+        result = scanner().scan_call(kwargs=func_args, name=func_name, exhaustive=False)
         if result.blocked:
             msg = (
                 f"🔐 SIGIL blocked `{func_name}`: "
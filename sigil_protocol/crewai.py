@@ -23,7 +23,6 @@ Usage:
 
 from __future__ import annotations
 
-import json
 from typing import Any, Optional, Type
 
 from .scanner import scanner
@@ -81,8 +80,7 @@ def sigil_gate(cls: Type[BaseTool]) -> Type[BaseTool]:
     original_run = cls._run
 
     def _guarded_run(self, *args: Any, **kwargs: Any) -> Any:
-        payload = json.dumps({"args": list(args), "kwargs": kwargs})
-        result = scanner().scan(payload)
+        result = scanner().scan_call(args, kwargs, exhaustive=False)
         if result.blocked:
             return (
                 f"🔐 SIGIL BLOCKED: This call to `{self.name}` was blocked because "
@@ -60,7 +60,10 @@ class SigilScanTool(BaseTool):
     args_schema: Type[BaseModel] = _ScanInput
 
     def _run(self, payload: str) -> str:
-        result = scanner().scan(payload)
+        return self._format(scanner().scan(payload))
+
+    @staticmethod
+    def _format(result: ScanResult) -> str:
         if not result.hit:
             return json.dumps({"status": "clean", "findings": []})
         findings = [
@@ -71,7 +74,8 @@ class SigilScanTool(BaseTool):
         return json.dumps({"status": status, "findings": findings})
 
     async def _arun(self, payload: str) -> str:
-        return self._run(payload)
+        result = await scanner().scan_async(payload)
+        return self._format(result)
 
 
 def sigil_tool(cls: Type[BaseTool]) -> Type[BaseTool]:
@@ -90,8 +94,7 @@ def sigil_tool(cls: Type[BaseTool]) -> Type[BaseTool]:
     original_arun = cls._arun if hasattr(cls, "_arun") else None
 
     def _guarded_run(self, *args: Any, **kwargs: Any) -> Any:
-        payload = json.dumps({"args": args, "kwargs": kwargs})
-        result = scanner().scan(payload)
+        result = scanner().scan_call(args, kwargs, exhaustive=False)
         if result.blocked:
             raise ValueError(
                 f"🔐 SIGIL blocked tool call to `{self.name}`: "
@@ -101,8 +104,7 @@ def sigil_tool(cls: Type[BaseTool]) -> Type[BaseTool]:
         return original_run(self, *args, **kwargs)
 
     async def _guarded_arun(self, *args: Any, **kwargs: Any) -> Any:
-        payload = json.dumps({"args": list(args), "kwargs": kwargs})
-        result = scanner().scan(payload)
+        result = await scanner().scan_call_async(args, kwargs, exhaustive=False)
         if result.blocked:
             raise ValueError(
                 f"🔐 SIGIL blocked tool call to `{self.name}`: "
@@ -28,7 +28,6 @@ Usage:
 
 from __future__ import annotations
 
-import json
 import logging
 from typing import Any
 
@@ -52,8 +51,7 @@ class SigilMiddleware:
         tool_args: dict[str, Any],
         next_handler,
     ) -> Any:
-        payload = json.dumps({"tool": tool_name, "args": tool_args})
-        result = scanner().scan(payload)
+        result = await scanner().scan_call_async(kwargs=tool_args, name=tool_name, exhaustive=False)
 
         if result.blocked:
             msg = (
@@ -78,9 +76,17 @@ class SigilMiddleware:
         result_content: Any,
         next_handler,
     ) -> Any:
-        """Also scan tool *responses* for accidentally returned credentials."""
-        payload = json.dumps(result_content) if not isinstance(result_content, str) else result_content
-        scan_result = scanner().scan(payload)
+        """Also scan tool *responses* for accidentally returned credentials.
+
+        Structured results can be megabytes (file reads, API responses); they
+        are streamed leaf by leaf instead of being dumped to JSON first.
+        """
+        if isinstance(result_content, str):
+            scan_result = await scanner().scan_async(result_content, exhaustive=False)
+        elif isinstance(result_content, (bytes, bytearray, memoryview)):
+            scan_result = await scanner().scan_bytes_async(result_content, exhaustive=False)
+        else:
+            scan_result = await scanner().scan_json_async(result_content, exhaustive=False)
         if scan_result.hit:
             logger.warning(
                 "SIGIL: secret in response from `%s`: %s (%s) — logged.",
@@ -20,7 +20,6 @@ Usage:
 
 from __future__ import annotations
 
-import json
 import logging
 from typing import Any
 
@@ -42,12 +41,16 @@ except ImportError:
 
 
 if _HAS_SDK:
-    from pydantic import BaseModel
+    from pydantic import BaseModel, ConfigDict
 
     class _SigilOutput(BaseModel):
+        model_config = ConfigDict(frozen=True)  # _CLEAN_OUTPUT is shared by every run
+
         blocked: bool
         reason: str | None = None
 
+    _CLEAN_OUTPUT = _SigilOutput(blocked=False)
+
     class SigilGuardrail(InputGuardrail):
         """
         OpenAI Agents SDK InputGuardrail backed by SIGIL's remote scanner.
@@ -62,8 +65,10 @@ if _HAS_SDK:
             agent: Agent,
             input: str | list[TResponseInputItem],
         ) -> GuardrailFunctionOutput:
-            text = input if isinstance(input, str) else json.dumps(input)
-            result = scanner().scan(text)
+            if isinstance(input, str):
+                result = await scanner().scan_async(input, exhaustive=False)
+            else:
+                result = await scanner().scan_call_async((input,), exhaustive=False)
 
             if result.blocked:
                 reason = (
@@ -82,7 +87,7 @@ if _HAS_SDK:
                 )
 
             return GuardrailFunctionOutput(
-                output_info=_SigilOutput(blocked=False),
+                output_info=_CLEAN_OUTPUT,
                 tripwire_triggered=False,
             )
 
@@ -0,0 +1,177 @@
+"""Tests for sigil-protocol pattern analysis helpers."""
+
+import re
+
+import pytest
+
+from sigil_protocol._regex import (
+    class_run, context_free, fold_caseless, folded_syntax, literal_anchors, match_cost, native_syntax,
+)
+
+
+def test_literal_prefix():
+    assert literal_anchors(r"AKIA[0-9A-Z]{16}") == (["AKIA"], False)
+
+
+def test_character_class_expanded():
+    assert literal_anchors(r"gh[ps]_[a-zA-Z0-9]{36}") == (["ghp_", "ghs_"], False)
+
+
+def test_caseless_alternation():
+    anchors, caseless = literal_anchors(r"(?i)(secret|password|passwd|api_key)\s*[:=]")
+    assert caseless
+    assert anchors == ["api_key", "passwd", "password", "secret"]
+
+
+def test_optional_literal_not_required():
+    assert literal_anchors(r"abc?d") == (["ab"], False)
+
+
+def test_no_literal_prefix():
+    assert literal_anchors(r"[A-Z]{2}\d{2}[A-Z0-9]{12,30}") is None
+    assert literal_anchors(r"(foo|\d+)") is None
+
+
+def test_class_run_shapes():
+    alnum = "".join(sorted("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"))
+    assert class_run(r"sk-[a-zA-Z0-9]{32,}") == (["sk-"], alnum, 32)
+    assert class_run(r"gh[ps]_[0-9A-Za-z]{36}") == (["ghp_", "ghs_"], alnum, 36)
+    assert class_run(r"AKIA[0-9A-Z]{16}") == (["AKIA"], "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ", 16)
+    assert class_run(r"xoxb-[0-9-]{10,}") == (["xoxb-"], "-0123456789", 10)
+    assert class_run(r"(?i)sk-[a-zA-Z0-9]{32,}") is None
+    assert class_run(r"sk-[a-zA-Z0-9]{32,}-") is None
+    assert class_run(r"key=[^\s]{8}") is None
+    assert class_run(r"key=\w{8}") is None
+
+
+@pytest.mark.parametrize("regex, expected", [
+    (r"(?i)DELETE\s+FROM\s+\w+\s*(?!WHERE)", True),
+    (r"\bpassword\b", True),
+    (r"^rm -rf", False),
+    (r"(?m)key$", False),
+    (r"token(?!\W)", False),
+    (r"(?>a+)b", False),
+])
+def test_context_free(regex, expected):
+    assert context_free(regex) is expected
+
+
+def test_match_cost_orders_cheap_patterns_first():
+    ranked = sorted(
+        [r"(?i)(ignore previous|act as|jailbreak)", r"[A-Z]{2}\d{2}", r"(?i)DROP\s+TABLE", r"AKIA[0-9A-Z]{16}"],
+        key=lambda regex: match_cost(re.compile(regex)),
+    )
+    assert ranked == [r"AKIA[0-9A-Z]{16}", r"(?i)DROP\s+TABLE", r"(?i)(ignore previous|act as|jailbreak)", r"[A-Z]{2}\d{2}"]
+
+
+def test_fold_caseless_matches_re_ignorecase():
+    assert "ignore previous" in fold_caseless("IGNORE PREVİOUS")
+    assert "ignore" in fold_caseless("ıgnore")
+
+
+def test_native_syntax_spells_out_unicode_classes():
+    src = native_syntax(re.compile(r"(?i)DROP\s+TABLE\s+\w+"))
+    assert src.startswith("(?i)DROP[")
+    assert r"\p{L}\p{N}_" in src
+
+
+def test_native_syntax_dollar_allows_final_newline():
+    assert native_syntax(re.compile(r"key$")) == r"key(?:\n?\z)"
+
+
+def test_native_syntax_rejects_divergent_constructs():
+    assert native_syntax(re.compile(r"\bpassword\b")) is None
+    assert native_syntax(re.compile(r"(?i:secret)=")) is None
+    assert native_syntax(re.compile(r"[\W]")) is None
+    assert native_syntax(re.compile(r"[a[:alpha:]]")) is None
+    assert native_syntax(re.compile(r"[:alpha:]")) is None
+
+
+def test_native_syntax_spells_out_python_only_escapes():
+    assert native_syntax(re.compile(r"key-\d{,3}x")) == r"key-[\p{Nd}]{0,3}x"
+    assert native_syntax(re.compile(r"a{,}\{,2}")) == r"a{0,}\{,2}"
+    assert native_syntax(re.compile(r"a\vb[\v]")) == r"a\x0bb[\x0b]"
+
+
+def _native_class_matches(engine: str, shorthand: str, text: str) -> set[int]:
+    """Indices of the characters of ``text`` that the native engine's
+    spelling of ``\\<shorthand>`` matches."""
+    source = native_syntax(re.compile(f"\\{shorthand}"))
+    if engine == "re2":
+        re2 = pytest.importorskip("re2")
+        return {m.start() for m in re2.finditer(source, text)}
+    hyperscan = pytest.importorskip("hyperscan")
+    db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+    db.compile(expressions=[source.encode()], ids=[0], elements=1,
+               flags=hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP)
+    index, end = {}, 0
+    for i, c in enumerate(text):
+        end += len(c.encode())
+        index[end] = i
+    found: set[int] = set()
+    db.scan(text.encode(), match_event_handler=lambda _id, _start, stop, *a: found.add(index[stop]))
+    return found
+
+
+@pytest.mark.parametrize("engine", ["re2", "hyperscan"])
+@pytest.mark.parametrize("shorthand", ["d", "w", "s"])
+def test_native_classes_differ_only_by_unicode_version(engine, shorthand):
+    import sys
+    import unicodedata
+    text = "".join(chr(c) for c in range(sys.maxunicode + 1) if not 0xD800 <= c <= 0xDFFF)
+    native = _native_class_matches(engine, shorthand, text)
+    python = {m.start() for m in re.finditer(f"\\{shorthand}", text)}
+    # Only code points that are new or recategorised since Unicode 3.2, or
+    # not yet assigned in the running Python's tables, may disagree.
+    drift = {
+        i for i in native ^ python
+        if unicodedata.category(text[i]) == "Cn"
+        or unicodedata.ucd_3_2_0.category(text[i]) != unicodedata.category(text[i])
+    }
+    assert native ^ python == drift
+    if shorthand == "s":
+        assert not drift
+
+
+@pytest.mark.parametrize("regex, text", [
+    (r"key-\d{,3}x", "key-x"),
+    (r"[a[:alpha:]]", "x"),
+    (r"a\vb", "a\nb"),
+])
+def test_native_syntax_matches_like_re(regex, text):
+    re2 = pytest.importorskip("re2")
+    source = native_syntax(re.compile(regex))
+    if source is not None:
+        assert bool(re2.search(source, text)) == bool(re.search(regex, text))
+
+
+_TRICKY = [
+    "", "drop table x", "DROP TABLE X", "DrOp\tTaBlE ümlaut", "ıgnore previous ınstructions",
+    "İGNORE PREVİOUS INSTRUCTİONS", "paſſword=ABCDEFGHIJKLMNOPQR", "API_KEY: 'abcdefghijklmnopqrst'",
+    "kK", "KK", "[a-f]", "A-F", "GX", "gx", "\nx", "Σx",
+]
+
+
+@pytest.mark.parametrize("regex", [
+    r"(?i)(secret|password|passwd|api_key)\s*[:=]\s*['\"]?[A-Za-z0-9+/]{16,}",
+    r"(?i)DROP\s+TABLE\s+\w+",
+    r"(?i)DELETE\s+FROM\s+\w+\s*(?!WHERE)",
+    r"(?i)(ignore previous instructions|you are now|act as|jailbreak)",
+    r"(?is)[^A-F]x",
+    r"(?i)(?P<k>K)(?P=k)",
+    r"(?i)[\[A-F\]-]-F",
+])
+def test_folded_syntax_matches_like_ignorecase(regex):
+    original = re.compile(regex)
+    folded = re.compile(folded_syntax(original))
+    for text in _TRICKY:
+        assert bool(original.search(text)) == bool(folded.search(fold_caseless(text))), text
+
+
+def test_folded_syntax_declines():
+    assert folded_syntax(re.compile(r"DROP TABLE")) is None  # already case-sensitive
+    assert folded_syntax(re.compile(r"(?i)\x41")) is None
+    assert folded_syntax(re.compile(r"(?i)a(?-i:B)")) is None
+    assert folded_syntax(re.compile(r"(?i)é")) is None
+    assert folded_syntax(re.compile(r"(?ai)ignore")) is None  # "ıgnore" is no match
+    assert folded_syntax(re.compile(r"(?ai)ask")) is None  # nor is "aſk"